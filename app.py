@@ -7,6 +7,8 @@ from src.summarizer import summarizer
 from src.chromadb_handler import chroma_handler
 from src.utils import validate_pdf, save_uploaded_file
 from src.rag_chain import rag_chain
+from src.paper_store import paper_store, paper_id_for
+from src.config import MAX_CHAT_MESSAGES
 import logging
 
 enable_tf32()
@@ -23,16 +25,24 @@ st.set_page_config(
 )
 
 # Initialize session state
+# Paper text and artifacts live in the shared paper_store; sessions only keep ids
+# and a lease that keeps the shared entry alive while the session holds it.
 if "current_paper" not in st.session_state:
     st.session_state.current_paper = None
-if "paper_text" not in st.session_state:
-    st.session_state.paper_text = None
-if "summary" not in st.session_state:
-    st.session_state.summary = None
+if "paper_id" not in st.session_state:
+    st.session_state.paper_id = None
+if "paper_lease" not in st.session_state:
+    st.session_state.paper_lease = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 
+def add_message(role: str, content: str):
+    """Append to chat history, keeping only the most recent MAX_CHAT_MESSAGES"""
+    st.session_state.messages.append({"role": role, "content": content})
+    del st.session_state.messages[:-MAX_CHAT_MESSAGES]
+
+
 # Main Title
 st.title("Research Paper Summarizer & Chat")
 
@@ -60,20 +70,30 @@ if uploaded_file:
         if st.button("Process & Summarize", key="process_btn", use_container_width=True):
             with st.spinner("Processing paper..."):
                 try:
-                    file_path = save_uploaded_file(uploaded_file)
+                    paper_id = paper_id_for(uploaded_file.getvalue())
                     
-                    with st.spinner("Extracting text..."):
-                        paper_text = extract_pdf_text(file_path)
-                    
-                    with st.spinner("Generating summary ..."):
-                        summary = summarizer.summarize(paper_text)
+                    def build_paper():
+                        file_path = save_uploaded_file(uploaded_file)
+                        
+                        with st.spinner("Extracting text..."):
+                            paper_text = extract_pdf_text(file_path)
+                        
+                        with st.spinner("Generating summary ..."):
+                            summary = summarizer.summarize(paper_text)
+                        
+                        with st.spinner("Indexing paper ..."):
+                            chroma_handler.add_paper(paper_text, uploaded_file.name, paper_id=paper_id)
+                        
+                        return {"name": uploaded_file.name, "text": paper_text, "summary": summary}
                     
-                    with st.spinner("Indexing paper ..."):
-                        chroma_handler.add_paper(paper_text, uploaded_file.name)
+                    # Papers already processed by another session are reused as-is
+                    lease = paper_store.acquire(paper_id, build_paper)
+                    if st.session_state.paper_lease is not None:
+                        st.session_state.paper_lease.release()
                     
                     st.session_state.current_paper = uploaded_file.name
-                    st.session_state.paper_text = paper_text
-                    st.session_state.summary = summary
+                    st.session_state.paper_id = paper_id
+                    st.session_state.paper_lease = lease
                     
                     st.success("Paper processed successfully!")
                     st.balloons()
@@ -83,10 +103,11 @@ if uploaded_file:
                     logger.error(f"Processing error: {str(e)}")
         
         # SECTION 3: DISPLAY SUMMARY
-        if st.session_state.summary:
+        paper = paper_store.get(st.session_state.paper_id) if st.session_state.paper_id else None
+        if paper and paper["summary"]:
             st.markdown("---")
             st.header("Summary")
-            st.write(st.session_state.summary)
+            st.write(paper["summary"])
         
         # SECTION 4: CHAT BOX
         if st.session_state.current_paper:
@@ -107,7 +128,7 @@ if uploaded_file:
             
             if user_input:
                 # Add user message
-                st.session_state.messages.append({"role": "user", "content": user_input})
+                add_message("user", user_input)
                 
                 # Display user message immediately
                 with chat_container:
@@ -117,10 +138,10 @@ if uploaded_file:
                 # Generate response
                 with st.spinner("Thinking ..."):
                     try:
-                        response = rag_chain.answer_question(user_input)
+                        response = rag_chain.answer_question(user_input, paper_id=st.session_state.paper_id)
                         
                         # Add assistant message
-                        st.session_state.messages.append({"role": "assistant", "content": response})
+                        add_message("assistant", response)
                         
                         # Display assistant message
                         with chat_container:
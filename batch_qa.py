@@ -0,0 +1,61 @@
+import argparse
+import json
+import logging
+import os
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Project modules are imported inside functions: with CPU_EMBED_WORKERS > 1 the
+# embedding pool spawns workers that re-import this module as __mp_main__, and
+# they must not build the global model, Chroma client or LLM clients.
+
+def load_questions(path: str):
+    """Read one question per line, skipping blanks and # comments"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a fixed list of questions about a paper")
+    parser.add_argument("pdf", help="Path to the research paper (PDF)")
+    parser.add_argument("questions", help="Text file with one question per line")
+    parser.add_argument("-o", "--output", default="batch_answers.jsonl", help="JSONL file to write answers to")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Maximum number of concurrent LLM calls (default: BATCH_QA_MAX_CONCURRENCY)")
+    args = parser.parse_args()
+    
+    from src.utils import create_directories, enable_tf32
+    from src.config import BATCH_QA_MAX_CONCURRENCY
+    from src.pdf_processor import extract_pdf_text
+    from src.chromadb_handler import chroma_handler
+    from src.rag_chain import rag_chain
+    from src.paper_store import paper_id_for
+    
+    enable_tf32()
+    create_directories()
+    
+    questions = load_questions(args.questions)
+    if not questions:
+        parser.error(f"No questions found in {args.questions}")
+    
+    with open(args.pdf, "rb") as f:
+        # Own id per run, so a live app session on the same PDF keeps its chunks
+        paper_id = f"batch-{paper_id_for(f.read())}-{uuid4().hex[:8]}"
+    paper_text = extract_pdf_text(args.pdf)
+    
+    try:
+        chroma_handler.add_paper(paper_text, os.path.basename(args.pdf), paper_id=paper_id)
+        max_concurrency = args.max_concurrency or BATCH_QA_MAX_CONCURRENCY
+        records = rag_chain.answer_questions(questions, max_concurrency=max_concurrency, paper_id=paper_id)
+    finally:
+        # The shared collection outlives this run; do not leave its chunks behind
+        chroma_handler.remove_paper(paper_id)
+    
+    with open(args.output, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    logger.info(f"Wrote {len(records)} answers to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measure CPU embedding throughput from 1 to N cores.
+
+For each core count n this times a single process with n intra-op threads and
+a pool of n worker processes pinned to one core each. Run from the repository root:
+    python -m benchmarks.cpu_scaling --max-cores 8
+"""
+import argparse
+import time
+
+# Project modules are imported inside functions: with CPU_EMBED_WORKERS > 1 the
+# embedding pool spawns workers that re-import this module as __mp_main__, and
+# they must not build the global model, Chroma client or LLM clients.
+
+def single_process(embedding_model, chunks: list, threads: int):
+    import torch
+    
+    torch.set_num_threads(threads)
+    with torch.no_grad():
+        embedding_model.model.encode(
+            chunks,
+            device="cpu",
+            batch_size=32,
+            show_progress_bar=False
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default="data/uploaded_pdfs")
+    parser.add_argument("--max-cores", type=int, default=None, help="Defaults to every available core")
+    args = parser.parse_args()
+    
+    from src.config import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+    from src.pdf_processor import chunk_text
+    from src.device_manager import device_manager
+    from src.embeddings import embedding_model
+    from src.cpu_pool import CPUEmbeddingPool
+    from benchmarks.embed_batching import load_corpus
+    
+    if device_manager.device.type != "cpu":
+        parser.error("CPU scaling benchmark requires USE_CUDA=false")
+    
+    chunks = [
+        c for text in load_corpus(args.pdf_dir)
+        for c in chunk_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        if len(c.strip()) > 15
+    ]
+    if not chunks:
+        parser.error(f"No chunks produced from PDFs in {args.pdf_dir}")
+    
+    max_cores = max(1, min(args.max_cores or len(device_manager.cpu_cores), len(device_manager.cpu_cores)))
+    print(f"{len(chunks)} chunks")
+    print(f"{'cores':>5} {'threads/s':>10} {'processes/s':>12}")
+    for n in range(1, max_cores + 1):
+        start = time.perf_counter()
+        single_process(embedding_model, chunks, n)
+        threads_time = time.perf_counter() - start
+        
+        pool = CPUEmbeddingPool(EMBEDDING_MODEL, [[core] for core in device_manager.cpu_cores[:n]])
+        pool.encode(chunks[:n])  # start workers and load their models outside the timing
+        start = time.perf_counter()
+        pool.encode(chunks)
+        pool_time = time.perf_counter() - start
+        pool.shutdown()
+        
+        print(f"{n:>5} {len(chunks) / threads_time:>10.1f} {len(chunks) / pool_time:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Tune HNSW parameters for latency against recall@k on the local corpus.
+
+Every setting in the grid is built into an in-memory Chroma collection and compared
+with exact brute-force cosine search. Both sides are re-ranked the way retrieve()
+does, so recall@k is the overlap of the final top k chunks. Candidate recall is the
+share of the exact top k found anywhere in the fetched candidates. Run from the
+repository root:
+    python -m benchmarks.hnsw_tuning --k 3 --target-recall 0.95
+"""
+import argparse
+import itertools
+import random
+import time
+import numpy as np
+
+# Project modules are imported inside functions: with CPU_EMBED_WORKERS > 1 the
+# embedding pool spawns workers that re-import this module as __mp_main__, and
+# they must not build the global model, Chroma client or LLM clients.
+
+def rerank_top_k(ids, distances, metadatas, k: int):
+    from src.chromadb_handler import rerank_score
+    
+    scored = sorted(zip(ids, distances), key=lambda item: rerank_score(item[1], metadatas[item[0]]))
+    return [i for i, _ in scored[:k]]
+
+def exact_top_k(doc_embeddings: np.ndarray, query_embeddings: np.ndarray, metadatas: list, k: int):
+    docs = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
+    queries = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+    # Cosine distance, as Chroma reports it for "hnsw:space": "cosine"
+    distances = 1 - queries @ docs.T
+    return [
+        set(rerank_top_k(range(len(docs)), row, metadatas, k))
+        for row in distances
+    ]
+
+def evaluate(client, embeddings, metadatas, query_embeddings, truth, k, m, ef_construction, ef_search, multiplier):
+    from src.chromadb_handler import hnsw_metadata, candidate_count
+    
+    name = f"hnsw_tuning_{m}_{ef_construction}_{ef_search}"
+    try:
+        client.delete_collection(name=name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(m, ef_construction, ef_search))
+    
+    start = time.perf_counter()
+    collection.add(ids=[str(i) for i in range(len(embeddings))], embeddings=embeddings.tolist(), metadatas=metadatas)
+    build_time = time.perf_counter() - start
+    
+    n_results = min(candidate_count(k, multiplier), len(embeddings))
+    latencies, hits, candidate_hits = [], 0, 0
+    for query, expected in zip(query_embeddings, truth):
+        start = time.perf_counter()
+        results = collection.query(query_embeddings=[query.tolist()], n_results=n_results)
+        latencies.append(time.perf_counter() - start)
+        
+        candidates = [int(i) for i in results["ids"][0]]
+        top_k = rerank_top_k(candidates, results["distances"][0], metadatas, k)
+        hits += len(expected & set(top_k))
+        candidate_hits += len(expected & set(candidates))
+    
+    client.delete_collection(name=name)
+    return {
+        "M": m,
+        "ef_construction": ef_construction,
+        "ef_search": ef_search,
+        "multiplier": multiplier,
+        "build_s": build_time,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "recall": hits / (len(truth) * k),
+        "candidate_recall": candidate_hits / (len(truth) * k),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default="data/uploaded_pdfs")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200, help="Number of chunks sampled as queries")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--multiplier", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+    
+    import chromadb
+    from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+    from src.pdf_processor import chunk_text
+    from src.embeddings import embedding_model
+    from src.chromadb_handler import chroma_handler
+    from benchmarks.embed_batching import load_corpus
+    
+    chunks = [
+        c for text in load_corpus(args.pdf_dir)
+        for c in chunk_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        if len(c.strip()) > 15
+    ]
+    if len(chunks) <= args.k:
+        parser.error(f"Need more than {args.k} chunks, got {len(chunks)}")
+    
+    embeddings = embedding_model.embed_batch(chunks)
+    metadatas = [{"is_metadata": chroma_handler._is_metadata_chunk(c)} for c in chunks]
+    # Use the opening of sampled chunks as queries so they resemble short questions
+    sample = random.Random(0).sample(range(len(chunks)), min(args.queries, len(chunks)))
+    query_embeddings = embedding_model.embed_batch([" ".join(chunks[i].split()[:20]) for i in sample])
+    truth = exact_top_k(embeddings, query_embeddings, metadatas, args.k)
+    
+    client = chromadb.EphemeralClient()
+    rows = [
+        evaluate(client, embeddings, metadatas, query_embeddings, truth, args.k, *params)
+        for params in itertools.product(args.m, args.ef_construction, args.ef_search, args.multiplier)
+    ]
+    
+    print(f"{len(chunks)} chunks, {len(sample)} queries, recall@{args.k}")
+    print(f"{'M':>4} {'ef_c':>5} {'ef_s':>5} {'mult':>5} {'build_s':>8} {'p50_ms':>7} {'p95_ms':>7} "
+          f"{'recall':>7} {'cand_rec':>9}")
+    for row in rows:
+        print(f"{row['M']:>4} {row['ef_construction']:>5} {row['ef_search']:>5} {row['multiplier']:>5} "
+              f"{row['build_s']:>8.2f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f} {row['recall']:>7.3f} "
+              f"{row['candidate_recall']:>9.3f}")
+    
+    eligible = [row for row in rows if row["recall"] >= args.target_recall]
+    if eligible:
+        best = min(eligible, key=lambda row: (row["p95_ms"], row["build_s"]))
+        print(f"\nRecommended (recall >= {args.target_recall}):")
+    else:
+        best = max(rows, key=lambda row: (row["recall"], -row["p95_ms"]))
+        print(f"\nNo setting reached recall {args.target_recall}; highest recall:")
+    print(f"HNSW_M={best['M']}")
+    print(f"HNSW_EF_CONSTRUCTION={best['ef_construction']}")
+    print(f"HNSW_EF_SEARCH={best['ef_search']}")
+    print(f"RETRIEVAL_CANDIDATE_MULTIPLIER={best['multiplier']}")
+
+if __name__ == "__main__":
+    main()
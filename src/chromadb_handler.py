@@ -1,34 +1,137 @@
 import logging
+import os
+import socket
 import chromadb
-from src.config import CHROMADB_PATH, COLLECTION_NAME
+import psutil
+from src.config import (
+    CHROMADB_PATH,
+    COLLECTION_NAME,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    RETRIEVAL_CANDIDATE_MULTIPLIER,
+    RETRIEVAL_MAX_CANDIDATES,
+)
 from src.embeddings import embedding_model
 from src.pdf_processor import chunk_text
 from src.device_manager import device_manager
 
 logger = logging.getLogger(__name__)
 
+def hnsw_metadata(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, ef_search: int = HNSW_EF_SEARCH):
+    """Collection metadata carrying the HNSW index parameters"""
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": m,
+        "hnsw:construction_ef": ef_construction,
+        "hnsw:search_ef": ef_search,
+    }
+
+def candidate_count(k: int, multiplier: int = RETRIEVAL_CANDIDATE_MULTIPLIER):
+    """Number of nearest neighbours to fetch before re-ranking down to k"""
+    return max(k, min(k * multiplier, RETRIEVAL_MAX_CANDIDATES))
+
+# Queries about the paper itself (title, authors, ...) are answered from its opening chunks
+METADATA_QUERY_KEYWORDS = ['title', 'author', 'abstract', 'university', 'affiliation', 'email']
+
+def is_metadata_query(query: str) -> bool:
+    return any(kw in query.lower() for kw in METADATA_QUERY_KEYWORDS)
+
+def rerank_score(distance: float, metadata: dict):
+    """Score used to re-rank candidates; lower is better"""
+    # Lower distance is better (inverse similarity)
+    score = distance
+    
+    # Boost metadata chunks
+    if metadata.get("is_metadata", False):
+        score *= 0.6  # Reduce distance (higher relevance)
+    
+    return score
+
 class ChromaDBHandler:
     def __init__(self):
         try:
             self.client = chromadb.PersistentClient(path=CHROMADB_PATH)
+            # Several processes may share CHROMADB_PATH; every chunk records which one owns it
+            self.host = socket.gethostname()
+            self.owner = f"{self.host}:{os.getpid()}"
             logger.info(f"ChromaDB initialized at {CHROMADB_PATH}")
+            self._warn_on_hnsw_mismatch()
         except Exception as e:
             logger.error(f"Error initializing ChromaDB: {str(e)}")
             raise
     
-    def add_paper(self, text: str, paper_name: str):
+    def _get_collection(self):
+        return self.client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            metadata=hnsw_metadata()
+        )
+    
+    def _warn_on_hnsw_mismatch(self):
+        # Chroma keeps an existing collection's index parameters and ignores new metadata
+        try:
+            collection = self.client.get_collection(name=COLLECTION_NAME)
+        except Exception:
+            return
+        stored = collection.metadata or {}
+        expected = hnsw_metadata()
+        if any(stored.get(key) != value for key, value in expected.items()):
+            logger.warning(
+                f"Collection '{COLLECTION_NAME}' was built with {stored}, not {expected}. "
+                "HNSW settings are ignored until the collection is recreated, which happens "
+                "at startup once no live process owns any chunks."
+            )
+    
+    def _is_orphan(self, metadata: dict) -> bool:
+        """A chunk is orphaned when it has no paper_id/owner, or its owning process on this host is gone"""
+        owner = (metadata or {}).get("owner")
+        if not owner or not metadata.get("paper_id"):
+            return True
+        host, _, pid = owner.rpartition(":")
+        # Owners on other hosts cannot be checked, so their chunks are left alone
+        return host == self.host and pid.isdigit() and not psutil.pid_exists(int(pid))
+    
+    def purge_orphans(self):
+        """Delete chunks no live process owns; recreate the collection if that empties it.
+        
+        Run once per process at startup. Chunks from crashed or restarted processes and
+        legacy chunks without a paper_id have nobody left to remove them.
+        """
         try:
-            # Delete old collection to avoid conflicts
-            try:
+            collection = self._get_collection()
+            existing = collection.get(include=["metadatas"])
+            orphan_ids = [
+                chunk_id for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+                if self._is_orphan(metadata)
+            ]
+            if orphan_ids:
+                collection.delete(ids=orphan_ids)
+                logger.info(f"Purged {len(orphan_ids)} orphaned chunks from ChromaDB")
+            
+            # HNSW parameters are fixed at creation, so apply new settings while nothing is stored
+            if len(orphan_ids) == len(existing["ids"]) and (collection.metadata or {}) != hnsw_metadata():
                 self.client.delete_collection(name=COLLECTION_NAME)
-                logger.info("Deleted old collection")
-            except:
-                pass
+                self._get_collection()
+                logger.info(f"Recreated collection '{COLLECTION_NAME}' with {hnsw_metadata()}")
+        except Exception as e:
+            logger.error(f"Error purging orphaned chunks: {str(e)}")
+    
+    def has_paper(self, paper_id: str) -> bool:
+        try:
+            found = self._get_collection().get(where={"paper_id": paper_id}, limit=1, include=[])
+            return bool(found["ids"])
+        except Exception as e:
+            logger.error(f"Error checking paper in ChromaDB: {str(e)}")
+            return False
+    
+    def add_paper(self, text: str, paper_name: str, paper_id: str = None):
+        """Index a paper's chunks, tagged with paper_id so retrieval can be scoped to it"""
+        try:
+            paper_id = paper_id or paper_name
+            collection = self._get_collection()
             
-            collection = self.client.create_collection(
-                name=COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine"}
-            )
+            # Replace any chunks previously indexed for this paper
+            collection.delete(where={"paper_id": paper_id})
             
             chunks = chunk_text(text)
             
@@ -42,7 +145,7 @@ class ChromaDBHandler:
             logger.info(f"Creating embeddings for {len(chunks)} chunks...")
             embeddings = embedding_model.embed_batch(chunks)
             
-            ids = [f"{paper_name}_{i}" for i in range(len(chunks))]
+            ids = [f"{paper_id}_{i}" for i in range(len(chunks))]
             
             collection.add(
                 ids=ids,
@@ -50,6 +153,8 @@ class ChromaDBHandler:
                 metadatas=[
                     {
                         "source": paper_name,
+                        "paper_id": paper_id,
+                        "owner": self.owner,
                         "chunk_id": i,
                         "chunk_length": len(chunk.split()),
                         "is_metadata": self._is_metadata_chunk(chunk)
@@ -59,7 +164,7 @@ class ChromaDBHandler:
                 documents=chunks
             )
             
-            logger.info(f"Successfully added {len(chunks)} chunks to ChromaDB")
+            logger.info(f"Successfully added {len(chunks)} chunks to ChromaDB for paper {paper_id}")
             
             if device_manager.device.type == "cuda":
                 import torch
@@ -69,85 +174,50 @@ class ChromaDBHandler:
             logger.error(f"Error adding paper to ChromaDB: {str(e)}")
             raise
     
+    def remove_paper(self, paper_id: str):
+        try:
+            self._get_collection().delete(where={"paper_id": paper_id})
+            logger.info(f"Removed paper {paper_id} from ChromaDB")
+        except Exception as e:
+            logger.error(f"Error removing paper from ChromaDB: {str(e)}")
+    
     def _is_metadata_chunk(self, chunk: str) -> bool:
         """Check if chunk contains metadata (title, authors, abstract)"""
         metadata_keywords = ['abstract', 'keywords', 'author', 'authors', 'university', 
                             'affiliation', 'correspondence', 'received', 'accepted', 'citation']
         return any(keyword in chunk.lower() for keyword in metadata_keywords)
     
-    def retrieve(self, query: str, k: int = 3):
+    def retrieve(self, query: str, k: int = 3, paper_id: str = None):
         try:
             collection = self.client.get_collection(name=COLLECTION_NAME)
+            where = {"paper_id": paper_id} if paper_id else None
             
             logger.info(f"Querying for: {query[:60]}")
             
-            # Check if this is a metadata query (title, authors, etc.)
-            metadata_keywords = ['title', 'author', 'abstract', 'university', 'affiliation', 'email']
-            is_metadata_query = any(kw in query.lower() for kw in metadata_keywords)
-            
             # For metadata queries, prioritize early chunks (which contain title, authors, etc.)
-            if is_metadata_query:
-                # Get all documents
-                all_docs = collection.get()
-                if all_docs and all_docs.get("documents"):
-                    # Sort by chunk_id to get early chunks first
-                    doc_metadata = list(zip(
-                        all_docs["documents"],
-                        all_docs.get("metadatas", [{}] * len(all_docs["documents"]))
-                    ))
-                    
-                    # Prioritize first 10 chunks (usually contain title, authors, abstract)
-                    early_chunks = []
-                    other_chunks = []
-                    
-                    for doc, meta in doc_metadata:
-                        chunk_id = meta.get("chunk_id", 999)
-                        if chunk_id < 10 or meta.get("is_metadata", False):
-                            early_chunks.append(doc)
-                        else:
-                            other_chunks.append(doc)
-                    
-                    # Return early chunks + some others for context
-                    docs = early_chunks[:k] + other_chunks[:max(1, k-len(early_chunks))]
+            if is_metadata_query(query):
+                split = self._split_early_chunks(collection, where)
+                if split:
+                    docs = self._metadata_docs(split, k)
                     logger.info(f"Retrieved {len(docs)} documents (metadata query mode)")
-                    return docs[:k]
+                    return docs
             
             # Regular semantic search for non-metadata queries
             query_embedding = embedding_model.embed_text(query)
             
             # Increase k to get more candidates
-            k_candidates = min(k * 3, 15)
+            k_candidates = candidate_count(k)
             
             # Query ChromaDB with larger k
             results = collection.query(
                 query_embeddings=[query_embedding.tolist() if hasattr(query_embedding, 'tolist') else query_embedding],
-                n_results=k_candidates
+                n_results=k_candidates,
+                where=where
             )
             
             # Extract documents and distances
             if results["documents"] and len(results["documents"]) > 0:
-                docs = results["documents"][0]
-                distances = results.get("distances", [0]*len(docs))[0] if results.get("distances") else [0]*len(docs)
-                metadatas = results.get("metadatas", [{}]*len(docs))[0] if results.get("metadatas") else [{}]*len(docs)
-                
-                # Score documents: prefer shorter distance + metadata chunks for metadata queries
-                scored_docs = []
-                for doc, distance, metadata in zip(docs, distances, metadatas):
-                    if len(doc.strip()) < 15:
-                        continue
-                    
-                    # Lower distance is better (inverse similarity)
-                    score = distance
-                    
-                    # Boost metadata chunks
-                    if metadata.get("is_metadata", False):
-                        score *= 0.6  # Reduce distance (higher relevance)
-                    
-                    scored_docs.append((doc, score))
-                
-                # Sort by score and take top k
-                scored_docs.sort(key=lambda x: x[1])
-                docs = [doc for doc, _ in scored_docs[:k]]
+                docs = self._rank_results(results, 0, k, k_candidates)
             else:
                 docs = []
             
@@ -157,5 +227,105 @@ class ChromaDBHandler:
         except Exception as e:
             logger.error(f"Error retrieving from ChromaDB: {str(e)}")
             return []
+    
+    def retrieve_batch(self, queries: list, ks: list, paper_id: str = None):
+        """Retrieve context for many queries with one embedding call and one query"""
+        try:
+            collection = self.client.get_collection(name=COLLECTION_NAME)
+            where = {"paper_id": paper_id} if paper_id else None
+            
+            logger.info(f"Batch querying for {len(queries)} questions")
+            
+            results_per_query = [[] for _ in queries]
+            semantic_idx = []
+            split = None
+            
+            for i, (query, k) in enumerate(zip(queries, ks)):
+                if not is_metadata_query(query):
+                    semantic_idx.append(i)
+                    continue
+                
+                # Metadata queries share a single scan of the collection
+                if split is None:
+                    split = self._split_early_chunks(collection, where)
+                
+                if split:
+                    results_per_query[i] = self._metadata_docs(split, k)
+                else:
+                    semantic_idx.append(i)
+            
+            if semantic_idx:
+                # One encode call and one query for every semantic question
+                query_embeddings = embedding_model.embed_batch([queries[i] for i in semantic_idx])
+                k_candidates = [candidate_count(ks[i]) for i in semantic_idx]
+                
+                results = collection.query(
+                    query_embeddings=query_embeddings.tolist() if hasattr(query_embeddings, 'tolist') else query_embeddings,
+                    n_results=max(k_candidates),
+                    where=where
+                )
+                
+                if results["documents"]:
+                    for row, i in enumerate(semantic_idx):
+                        results_per_query[i] = self._rank_results(results, row, ks[i], k_candidates[row])
+            
+            # Questions about the same paper overlap heavily; report how many chunks they share
+            total_docs = sum(len(docs) for docs in results_per_query)
+            unique_docs = set(doc for docs in results_per_query for doc in docs)
+            logger.info(
+                f"Retrieved {len(unique_docs)} unique documents for {len(queries)} questions "
+                f"({total_docs - len(unique_docs)} repeated across questions)"
+            )
+            return results_per_query
+        
+        except Exception as e:
+            logger.error(f"Error batch retrieving from ChromaDB: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _split_early_chunks(self, collection, where):
+        """Split a paper's chunks into (early, other); empty tuple if there are none"""
+        all_docs = collection.get(where=where)
+        if not all_docs or not all_docs.get("documents"):
+            return ()
+        
+        # Prioritize first 10 chunks (usually contain title, authors, abstract)
+        early_chunks = []
+        other_chunks = []
+        
+        for doc, meta in zip(
+            all_docs["documents"],
+            all_docs.get("metadatas", [{}] * len(all_docs["documents"]))
+        ):
+            chunk_id = meta.get("chunk_id", 999)
+            if chunk_id < 10 or meta.get("is_metadata", False):
+                early_chunks.append(doc)
+            else:
+                other_chunks.append(doc)
+        
+        return early_chunks, other_chunks
+    
+    def _metadata_docs(self, split: tuple, k: int):
+        early_chunks, other_chunks = split
+        # Return early chunks + some others for context
+        docs = early_chunks[:k] + other_chunks[:max(1, k-len(early_chunks))]
+        return docs[:k]
+    
+    def _rank_results(self, results: dict, row: int, k: int, k_candidates: int):
+        """Score one row of a ChromaDB query result and return the top k documents"""
+        docs = results["documents"][row][:k_candidates]
+        distances = results["distances"][row][:k_candidates] if results.get("distances") else [0]*len(docs)
+        metadatas = results["metadatas"][row][:k_candidates] if results.get("metadatas") else [{}]*len(docs)
+        
+        # Score documents: prefer shorter distance + metadata chunks for metadata queries
+        scored_docs = []
+        for doc, distance, metadata in zip(docs, distances, metadatas):
+            if len(doc.strip()) < 15:
+                continue
+            
+            scored_docs.append((doc, rerank_score(distance, metadata)))
+        
+        # Sort by score and take top k
+        scored_docs.sort(key=lambda x: x[1])
+        return [doc for doc, _ in scored_docs[:k]]
 
 chroma_handler = ChromaDBHandler()
@@ -21,3 +21,18 @@ CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))
 USE_CUDA = os.getenv("USE_CUDA", "true").lower() == "true"
 CUDA_DEVICE = int(os.getenv("CUDA_DEVICE", 0))
 MIXED_PRECISION = os.getenv("MIXED_PRECISION", "fp16")
+BATCH_QA_MAX_CONCURRENCY = int(os.getenv("BATCH_QA_MAX_CONCURRENCY", 4))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 128))
+EMBED_CPU_MAX_BATCH_SIZE = int(os.getenv("EMBED_CPU_MAX_BATCH_SIZE", 32))  # larger CPU batches lose throughput
+EMBED_CPU_MEMORY_BUDGET_GB = float(os.getenv("EMBED_CPU_MEMORY_BUDGET_GB", 4))  # per-batch cap on CPU
+EMBED_GPU_MEMORY_FRACTION = float(os.getenv("EMBED_GPU_MEMORY_FRACTION", 0.8))
+CPU_THREADS = int(os.getenv("CPU_THREADS", 0))  # 0 = one per available core
+CPU_EMBED_WORKERS = int(os.getenv("CPU_EMBED_WORKERS", 1))  # >1 enables the embedding process pool
+CPU_POOL_MIN_TEXTS = int(os.getenv("CPU_POOL_MIN_TEXTS", 256))
+# HNSW settings apply when the collection is created; it is recreated at startup only if empty
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 100))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 10))
+RETRIEVAL_CANDIDATE_MULTIPLIER = int(os.getenv("RETRIEVAL_CANDIDATE_MULTIPLIER", 3))
+RETRIEVAL_MAX_CANDIDATES = int(os.getenv("RETRIEVAL_MAX_CANDIDATES", 15))
+MAX_CHAT_MESSAGES = max(1, int(os.getenv("MAX_CHAT_MESSAGES", 40)))
@@ -0,0 +1,83 @@
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Worker-side state. This module deliberately avoids importing src.config or the
+# global model singletons so spawned workers only load what they need.
+_worker_model = None
+
+def _init_worker(model_name: str, core_queue):
+    global _worker_model
+    cores = core_queue.get()
+    try:
+        os.sched_setaffinity(0, cores)
+    except AttributeError:
+        pass  # sched_setaffinity is Linux-only
+    torch.set_num_threads(len(cores))
+    
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+    _worker_model.eval()
+
+def _encode_shard(texts: list, batch_size: int):
+    # Same CPU batch cap as the in-process path, halved on out-of-memory
+    while True:
+        try:
+            with torch.no_grad():
+                return _worker_model.encode(
+                    texts,
+                    batch_size=batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+        except (RuntimeError, MemoryError) as e:
+            message = str(e).lower()
+            oom = isinstance(e, MemoryError) or "out of memory" in message or "not enough memory" in message
+            if batch_size == 1 or not oom:
+                raise
+            batch_size //= 2
+
+class CPUEmbeddingPool:
+    """Worker processes, each pinned to its own group of cores, holding a model copy"""
+    
+    def __init__(self, model_name: str, core_groups: list, batch_size: int = 32):
+        ctx = mp.get_context("spawn")
+        core_queue = ctx.Queue()
+        for cores in core_groups:
+            core_queue.put(cores)
+        
+        self.n_workers = len(core_groups)
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(model_name, core_queue)
+        )
+        logger.info(f"Started CPU embedding pool with {self.n_workers} workers on cores {core_groups}")
+    
+    def encode(self, texts: list):
+        # Deal length-sorted texts round-robin so every shard gets a similar token count
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        shards = [order[w::self.n_workers] for w in range(self.n_workers)]
+        shards = [shard for shard in shards if shard]
+        
+        futures = [
+            self.executor.submit(_encode_shard, [texts[i] for i in shard], self.batch_size)
+            for shard in shards
+        ]
+        
+        embeddings = [None] * len(texts)
+        for shard, future in zip(shards, futures):
+            for i, emb in zip(shard, future.result()):
+                embeddings[i] = emb
+        return np.stack(embeddings)
+    
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("CPU embedding pool shut down")
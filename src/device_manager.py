@@ -1,6 +1,7 @@
+import os
 import torch
 import logging
-from src.config import USE_CUDA, CUDA_DEVICE, MIXED_PRECISION
+from src.config import USE_CUDA, CUDA_DEVICE, MIXED_PRECISION, CPU_THREADS, CPU_EMBED_WORKERS
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +11,10 @@ class DeviceManager:
         self.use_cuda = USE_CUDA and self.cuda_available
         self.device = self._get_device()
         self.mixed_precision = MIXED_PRECISION
+        self.cpu_cores = self._get_cpu_cores()
+        self.cpu_workers = 1
+        if self.device.type == "cpu":
+            self._configure_cpu()
         self._log_device_info()
     
     def _get_device(self):
@@ -26,6 +31,31 @@ class DeviceManager:
             logger.info("Using CPU device")
             return torch.device("cpu")
     
+    def _get_cpu_cores(self):
+        try:
+            return sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            # sched_getaffinity is Linux-only
+            return list(range(os.cpu_count() or 1))
+    
+    def _configure_cpu(self):
+        """Set intra-op threads explicitly and size the embedding worker pool"""
+        threads = CPU_THREADS if CPU_THREADS > 0 else len(self.cpu_cores)
+        torch.set_num_threads(threads)
+        self.cpu_workers = max(1, min(CPU_EMBED_WORKERS, len(self.cpu_cores)))
+        logger.info(f"CPU intra-op threads: {threads}, embedding workers: {self.cpu_workers}")
+    
+    def cpu_core_groups(self, n_groups: int):
+        """Split the available cores into n_groups contiguous, near-equal groups"""
+        n_groups = max(1, min(n_groups, len(self.cpu_cores)))
+        size, extra = divmod(len(self.cpu_cores), n_groups)
+        groups, start = [], 0
+        for i in range(n_groups):
+            end = start + size + (1 if i < extra else 0)
+            groups.append(self.cpu_cores[start:end])
+            start = end
+        return groups
+    
     def _log_device_info(self):
         logger.info(f"CUDA Available: {self.cuda_available}")
         logger.info(f"Using CUDA: {self.use_cuda}")
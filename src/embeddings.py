@@ -1,11 +1,28 @@
+import atexit
 import logging
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
-from src.config import EMBEDDING_MODEL
+from src.config import (
+    EMBEDDING_MODEL,
+    EMBED_MAX_BATCH_SIZE,
+    EMBED_CPU_MAX_BATCH_SIZE,
+    EMBED_CPU_MEMORY_BUDGET_GB,
+    EMBED_GPU_MEMORY_FRACTION,
+    CPU_POOL_MIN_TEXTS,
+)
 from src.device_manager import device_manager
+from src.cpu_pool import CPUEmbeddingPool
+from src.utils import check_cuda_memory, get_available_memory
 
 logger = logging.getLogger(__name__)
 
+# Rough activation footprint per token, as a multiple of embedding dim * element size.
+# Covers the stacked layers, the FFN expansion and attention buffers of small encoders.
+ACTIVATION_FACTOR = 64
+
 class EmbeddingModel:
     def __init__(self):
         try:
@@ -14,6 +31,8 @@ class EmbeddingModel:
             self.model = SentenceTransformer(EMBEDDING_MODEL)
             self.model.to(self.device)
             self.model.eval()
+            self._cpu_pool = None
+            self._cpu_pool_lock = threading.Lock()
             logger.info(f"Loaded embedding model: {EMBEDDING_MODEL}")
             logger.info(f"Embedding model device: {self.device}, dtype: {self.dtype}")
         except Exception as e:
@@ -34,21 +53,116 @@ class EmbeddingModel:
             raise
     
     def embed_batch(self, texts: list):
+        """Embed texts in length-sorted batches sized to the memory currently available.
+        
+        Inputs are ordered longest first so an out-of-memory error shows up on the
+        first batch; the batch size is then halved and retried. Embeddings are
+        returned in the original input order.
+        """
         try:
-            with torch.no_grad():
-                embeddings = self.model.encode(
-                    texts,
-                    convert_to_tensor=True,
-                    device=self.device,
-                    batch_size=32,
-                    show_progress_bar=True
-                )
+            if not texts:
+                return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            
+            if (
+                self.device.type == "cpu"
+                and device_manager.cpu_workers > 1
+                and len(texts) >= CPU_POOL_MIN_TEXTS
+            ):
+                pool = self.get_cpu_pool()
+                try:
+                    embeddings = pool.encode(texts)
+                    logger.info(f"Generated {len(embeddings)} embeddings on {device_manager.cpu_workers} CPU workers")
+                    return embeddings
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. OOM killer); drop the pool so the next ingest starts a fresh one
+                    logger.warning(f"CPU embedding pool broke, falling back to in-process embedding: {str(e)}")
+                    self._reset_cpu_pool(pool)
+            
+            lengths = self._token_lengths(texts)
+            order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+            token_budget = self._token_budget()
+            max_batch_size = EMBED_MAX_BATCH_SIZE if self.device.type == "cuda" else EMBED_CPU_MAX_BATCH_SIZE
+            
+            embeddings = [None] * len(texts)
+            pos = 0
+            while pos < len(order):
+                longest = lengths[order[pos]]
+                batch_size = max(1, min(max_batch_size, token_budget // longest))
+                batch_idx = order[pos:pos + batch_size]
+                
+                try:
+                    with torch.no_grad():
+                        batch = self.model.encode(
+                            [texts[i] for i in batch_idx],
+                            convert_to_tensor=True,
+                            device=self.device,
+                            batch_size=len(batch_idx),
+                            show_progress_bar=False
+                        )
+                except (RuntimeError, MemoryError) as e:
+                    if batch_size == 1 or not self._is_oom(e):
+                        raise
+                    max_batch_size = batch_size // 2
+                    logger.warning(f"Out of memory at batch size {batch_size}, retrying with {max_batch_size}: {str(e)}")
+                    device_manager.empty_cache()
+                    continue
+                
+                for i, emb in zip(batch_idx, batch.cpu().numpy()):
+                    embeddings[i] = emb
+                pos += len(batch_idx)
+            
             logger.info(f"Generated {len(embeddings)} embeddings on {self.device}")
-            return embeddings.cpu().numpy()
+            return np.stack(embeddings)
         except Exception as e:
             logger.error(f"Error batch embedding: {str(e)}")
             raise
     
+    def get_cpu_pool(self):
+        """Start the CPU worker pool on first use and reuse it across ingests"""
+        with self._cpu_pool_lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = CPUEmbeddingPool(
+                    EMBEDDING_MODEL,
+                    device_manager.cpu_core_groups(device_manager.cpu_workers),
+                    batch_size=EMBED_CPU_MAX_BATCH_SIZE
+                )
+                atexit.register(self._cpu_pool.shutdown)
+        return self._cpu_pool
+    
+    def _reset_cpu_pool(self, pool):
+        with self._cpu_pool_lock:
+            if self._cpu_pool is pool:
+                self._cpu_pool = None
+        atexit.unregister(pool.shutdown)
+        pool.shutdown(wait=False)
+    
+    @staticmethod
+    def _is_oom(error: Exception) -> bool:
+        if isinstance(error, (torch.cuda.OutOfMemoryError, MemoryError)):
+            return True
+        message = str(error).lower()
+        return "out of memory" in message or "not enough memory" in message
+    
+    def _token_lengths(self, texts: list):
+        encoded = self.model.tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.model.max_seq_length
+        )
+        return [max(1, len(ids)) for ids in encoded["input_ids"]]
+    
+    def _token_budget(self):
+        """Number of tokens that fit in one forward pass given current free memory"""
+        if self.device.type == "cuda":
+            available_gb = check_cuda_memory(self.device) * EMBED_GPU_MEMORY_FRACTION
+        else:
+            available_gb = min(get_available_memory(), EMBED_CPU_MEMORY_BUDGET_GB)
+        
+        element_size = next(self.model.parameters()).element_size()
+        bytes_per_token = self.model.get_sentence_embedding_dimension() * element_size * ACTIVATION_FACTOR
+        return int(max(available_gb, 0) * 1e9 // bytes_per_token)
+    
     def __del__(self):
         if self.device.type == "cuda":
             torch.cuda.empty_cache()
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import threading
+import weakref
+from src.chromadb_handler import chroma_handler
+
+logger = logging.getLogger(__name__)
+
+def paper_id_for(data: bytes) -> str:
+    """Content hash of an uploaded file, so identical uploads share one entry"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+class PaperLease:
+    """Held in a session; releases its reference when dropped or released explicitly"""
+    
+    def __init__(self, store, paper_id: str):
+        self.paper_id = paper_id
+        self._finalizer = weakref.finalize(self, store.release, paper_id)
+    
+    def release(self):
+        self._finalizer()
+
+class PaperStore:
+    """Process-wide, reference-counted paper text and artifacts shared by all sessions"""
+    
+    def __init__(self, on_evict=None, is_indexed=None):
+        self._papers = {}
+        self._refcounts = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self._on_evict = on_evict
+        self._is_indexed = is_indexed
+    
+    def acquire(self, paper_id: str, build):
+        """Return a lease on paper_id, calling build() once to create its entry if needed.
+        
+        build must return a dict of artifacts (text, summary, ...). An entry whose index
+        has disappeared (is_indexed returns False) is rebuilt rather than reused.
+        """
+        with self._lock:
+            self._refcounts[paper_id] = self._refcounts.get(paper_id, 0) + 1
+            build_lock = self._build_locks.setdefault(paper_id, threading.Lock())
+        
+        try:
+            # Concurrent sessions uploading the same paper wait for a single build
+            with build_lock:
+                stale = paper_id in self._papers and self._is_indexed and not self._is_indexed(paper_id)
+                if stale:
+                    logger.warning(f"Paper {paper_id} lost its index, rebuilding")
+                if paper_id not in self._papers or stale:
+                    entry = build()
+                    with self._lock:
+                        self._papers[paper_id] = entry
+                    logger.info(f"Stored paper {paper_id}")
+        except Exception:
+            self.release(paper_id)
+            raise
+        
+        return PaperLease(self, paper_id)
+    
+    def release(self, paper_id: str):
+        with self._lock:
+            count = self._refcounts.get(paper_id, 0) - 1
+            if count > 0:
+                self._refcounts[paper_id] = count
+                return
+            self._refcounts.pop(paper_id, None)
+            build_lock = self._build_locks.get(paper_id)
+        
+        if build_lock is None:
+            return
+        
+        # Evict under the paper's own build lock: an acquire that arrives meanwhile waits
+        # here instead of re-indexing while its chunks are being removed, and get() on
+        # other papers is never blocked by the disk delete.
+        with build_lock:
+            with self._lock:
+                if self._refcounts.get(paper_id):
+                    return  # re-acquired; the waiting session reuses the entry
+                entry = self._papers.pop(paper_id, None)
+            
+            if entry is not None:
+                logger.info(f"Evicted paper {paper_id}, no sessions left")
+                if self._on_evict:
+                    self._on_evict(paper_id)
+            
+            with self._lock:
+                if not self._refcounts.get(paper_id):
+                    self._build_locks.pop(paper_id, None)
+    
+    def get(self, paper_id: str):
+        with self._lock:
+            return self._papers.get(paper_id)
+
+# Module import happens once per process, before any session can hold a paper
+chroma_handler.purge_orphans()
+paper_store = PaperStore(on_evict=chroma_handler.remove_paper, is_indexed=chroma_handler.has_paper)
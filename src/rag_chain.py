@@ -1,9 +1,11 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from src.config import GROQ_API_KEY, GROQ_MODEL, RETRIEVAL_K
-from src.chromadb_handler import chroma_handler
+from src.config import GROQ_API_KEY, GROQ_MODEL, RETRIEVAL_K, BATCH_QA_MAX_CONCURRENCY
+from src.chromadb_handler import chroma_handler, is_metadata_query
 
 logger = logging.getLogger(__name__)
 
@@ -45,43 +47,80 @@ Answer:"""
             logger.error(f"Error initializing RAG chain: {str(e)}")
             raise
     
-    def answer_question(self, question: str):
+    def _k_for_question(self, question: str) -> int:
+        # Get more results for metadata questions
+        if is_metadata_query(question):
+            return 8  # Get more context for metadata
+        return RETRIEVAL_K
+    
+    def answer_question(self, question: str, paper_id: str = None):
         try:
-            # Get more results for metadata questions
-            k_results = RETRIEVAL_K
-            metadata_keywords = ['author', 'title', 'abstract', 'university', 'affiliation', 'email', 'name']
-            
-            if any(keyword in question.lower() for keyword in metadata_keywords):
-                k_results = 8  # Get more context for metadata
-            
-            context_docs = chroma_handler.retrieve(question, k=k_results)
-            
-            if not context_docs:
-                return "I couldn't find relevant information in the paper for this question."
-            
-            # Filter and validate
-            valid_docs = [doc for doc in context_docs if len(doc.strip()) > 15]
-            
-            if not valid_docs:
-                return "The retrieved content is too short to answer this question reliably."
-            
-            # Log what we're using
-            logger.info(f"Using {len(valid_docs)} documents for answer")
-            for i, doc in enumerate(valid_docs):
-                logger.info(f"Doc {i}: {doc[:80]}...")
-            
-            context = "\n\n---DOCUMENT BOUNDARY---\n\n".join(valid_docs)
-            
-            response = self.chain.invoke({
-                "context": context,
-                "question": question
-            })
-            
-            logger.info(f"Answer: {response[:100]}")
-            return response
+            context_docs = chroma_handler.retrieve(question, k=self._k_for_question(question), paper_id=paper_id)
+            return self._generate(question, context_docs)
         
         except Exception as e:
             logger.error(f"Error: {str(e)}")
             return f"Error: {str(e)}"
+    
+    def answer_questions(self, questions: list, max_concurrency: int = BATCH_QA_MAX_CONCURRENCY, paper_id: str = None):
+        """Answer many questions with shared retrieval and concurrent generation.
+        
+        Returns one dict per question, in input order, with the answer, its generation
+        latency and the latency of the shared batch retrieval.
+        """
+        start = time.perf_counter()
+        contexts = chroma_handler.retrieve_batch(
+            questions, [self._k_for_question(q) for q in questions], paper_id=paper_id
+        )
+        retrieval_time = time.perf_counter() - start
+        logger.info(f"Batch retrieval for {len(questions)} questions took {retrieval_time:.2f}s")
+        
+        def run(item):
+            question, context_docs = item
+            t0 = time.perf_counter()
+            try:
+                answer = self._generate(question, context_docs)
+            except Exception as e:
+                logger.error(f"Error: {str(e)}")
+                answer = f"Error: {str(e)}"
+            return {
+                "question": question,
+                "answer": answer,
+                "num_context_docs": len(context_docs),
+                "generation_latency_s": round(time.perf_counter() - t0, 3),
+            }
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            records = list(pool.map(run, zip(questions, contexts)))
+        
+        for record in records:
+            # Retrieval runs once for the whole batch, so every record carries the shared total
+            record["batch_retrieval_latency_s"] = round(retrieval_time, 3)
+        return records
+    
+    def _generate(self, question: str, context_docs: list):
+        if not context_docs:
+            return "I couldn't find relevant information in the paper for this question."
+        
+        # Filter and validate
+        valid_docs = [doc for doc in context_docs if len(doc.strip()) > 15]
+        
+        if not valid_docs:
+            return "The retrieved content is too short to answer this question reliably."
+        
+        # Log what we're using
+        logger.info(f"Using {len(valid_docs)} documents for answer")
+        for i, doc in enumerate(valid_docs):
+            logger.info(f"Doc {i}: {doc[:80]}...")
+        
+        context = "\n\n---DOCUMENT BOUNDARY---\n\n".join(valid_docs)
+        
+        response = self.chain.invoke({
+            "context": context,
+            "question": question
+        })
+        
+        logger.info(f"Answer: {response[:100]}")
+        return response
 
 rag_chain = RAGChain()
@@ -3,6 +3,7 @@ from pathlib import Path
 import logging
 import torch
 import re
+import psutil
 from src.config import USE_CUDA
 
 logging.basicConfig(level=logging.INFO)
@@ -63,11 +64,16 @@ def check_cuda_memory(device):
         total = torch.cuda.get_device_properties(device).total_memory / 1e9
         reserved = torch.cuda.memory_reserved(device) / 1e9
         allocated = torch.cuda.memory_allocated(device) / 1e9
-        free = reserved - allocated
+        # Unreserved device memory plus what the caching allocator can reuse
+        free = torch.cuda.mem_get_info(device)[0] / 1e9 + reserved - allocated
         logger.info(f"GPU Memory - Total: {total:.2f}GB, Reserved: {reserved:.2f}GB, Allocated: {allocated:.2f}GB, Free: {free:.2f}GB")
         return free
     return None
 
+def get_available_memory():
+    """System memory available to new allocations in GB"""
+    return psutil.virtual_memory().available / 1e9
+
 def enable_tf32():
     """Enable TensorFloat-32 for faster computation (if using compatible GPU)"""
     if USE_CUDA: